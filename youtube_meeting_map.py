@@ -1,59 +1,107 @@
 import os
 import re
-import folium
-import yt_dlp
-import base64
-from googlemaps import Client as GoogleMaps
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 
+_TITLE_RE = re.compile(r'(\d{2}/\d{2}/\d{2}) - (.+)')
+_HAS_DIGIT_RE = re.compile(r'\d')
+_SHORT_ADDRESS_RE = re.compile(
+    r'\b\d{1,5}\s(?:[NSEW]\s)?(?:\w+\s){1,3}(?:St|Ave|Blvd|Rd|Dr|Ln|Ct|Pl|Way|Terr|Pkwy|Cir)\b'
+)
+# Template indentation and blank lines in the rendered map; newlines are kept so
+# any line-based JavaScript stays intact
+_INDENTATION_RE = re.compile(r'\n\s+')
 
+GEOCODE_CACHE_FILE = "geocode_cache.json"
+# Google Maps Platform terms allow geocoded coordinates to be cached for at most
+# 30 consecutive days; older entries are geocoded again and dropped from the file
+GEOCODE_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+GEOCODE_WORKERS = 10
+# Stay under the Geocoding API limit of 3000 queries per minute
+GEOCODE_QUERIES_PER_SECOND = 50
+GEOCODE_TIMEOUT = 5
+YOUTUBE_WORKERS = 8
+
+# Leaflet callback used by FastMarkerCluster; each row is [lat, lng, popup_html]
+_MARKER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup(row[2]);
+    return marker;
+}
+"""
+
+
+@lru_cache(maxsize=4096)
 def extract_meeting_details(title):
     """Extracts the meeting date and type from the title."""
-    pattern = r'(\d{2}/\d{2}/\d{2}) - (.+)'
-    match = re.match(pattern, title)
+    match = _TITLE_RE.match(title)
     if match:
         date, meeting_type = match.groups()
         return date, meeting_type
     return None, None
 
 
-def group_videos_with_short_addresses(video_details, base_file_url):
-    """Groups videos by address."""
-    address_pattern = r'\b\d{1,5}\s(?:[NSEW]\s)?(?:\w+\s){1,3}(?:St|Ave|Blvd|Rd|Dr|Ln|Ct|Pl|Way|Terr|Pkwy|Cir)\b'
+def process_videos(video_details, base_file_url, output_dir="descriptions"):
+    """
+    Saves each video description to a text file and groups the videos by address,
+    as pre-rendered popup list items, in a single pass over the videos.
+
+    The result maps a normalized address key to the first spelling seen for that
+    address and the list items of every video that mentions it.
+    """
+    os.makedirs(output_dir, exist_ok=True)
     address_dict = {}
 
     for video in video_details:
+        description = video['description']
+        file_path = os.path.join(output_dir, f"{video['video_id']}.txt")
+        # Encode once and hand the bytes to a binary file in a single write
+        with open(file_path, "wb") as file:
+            file.write(description.encode("utf-8"))
+
+        # Every address starts with a house number; skip descriptions without digits
+        if not _HAS_DIGIT_RE.search(description):
+            continue
+
+        # Only meeting recordings ("MM/DD/YY - Type" titles) are mapped
+        date, meeting_type = extract_meeting_details(video['title'])
+        if date is None:
+            continue
+
         video_url = f"https://www.youtube.com/watch?v={video['video_id']}"
         description_file_url = f"{base_file_url}/{video['video_id']}.txt"
-        title = video['title']
-        date, meeting_type = extract_meeting_details(title)
-        addresses = re.findall(address_pattern, video['description'])
-
-        for address in addresses:
-            if address not in address_dict:
-                address_dict[address] = []
-            address_dict[address].append({
-                "date": date,
-                "meeting_type": meeting_type,
-                "video_url": video_url,
-                "description_file_url": description_file_url,
-                "description": video['description']
-            })
 
-    return address_dict
+        # The pattern's \s can match a newline or tab, and the street name's case
+        # varies between descriptions; key each address on a whitespace- and
+        # case-normalized form so it is grouped, geocoded and mapped only once.
+        # Repeat mentions within a description collapse onto the first one.
+        addresses = {}
+        for match in _SHORT_ADDRESS_RE.finditer(description):
+            address = " ".join(match.group().split())
+            addresses.setdefault(address.lower(), address)
 
+        # Render the popup list item once per video; every address the video
+        # mentions shares the same string
+        entry = (
+            f'<li>'
+            f'<b>{date} - {meeting_type}</b><br>'
+            f'Recording: <a href="{video_url}" target="_blank">Watch Video</a><br>'
+            f'Description: <a href="{description_file_url}" target="_blank">View Details</a>'
+            f'</li>'
+        )
+        for key, address in addresses.items():
+            group = address_dict.setdefault(key, {"address": address, "videos": []})
+            group["videos"].append(entry)
 
-def save_descriptions_to_files(video_details, output_dir="descriptions"):
-    """Save video descriptions to text files."""
-    os.makedirs(output_dir, exist_ok=True)
-    for video in video_details:
-        file_path = os.path.join(output_dir, f"{video['video_id']}.txt")
-        with open(file_path, "w", encoding="utf-8") as file:
-            file.write(video['description'])
+    return address_dict
 
 
-def geocode_address(address, api_key):
-    """Geocode an address using Google Maps API."""
-    gmaps = GoogleMaps(api_key)
+def geocode_address(address, gmaps):
+    """Geocode an address using a Google Maps API client."""
     try:
         geocode_result = gmaps.geocode(address)
         if geocode_result:
@@ -64,34 +112,144 @@ def geocode_address(address, api_key):
     return None, None
 
 
-def create_map_with_meeting_types(address_dict, api_key):
+def _is_fresh_geocode(entry, now):
+    """Checks that a geocode cache entry is well-formed and not past its max age."""
+    return (
+        isinstance(entry, dict)
+        and "lat" in entry
+        and "lng" in entry
+        and isinstance(entry.get("cached_at"), (int, float))
+        and now - entry["cached_at"] < GEOCODE_CACHE_MAX_AGE
+    )
+
+
+def load_geocode_cache(cache_file=GEOCODE_CACHE_FILE):
+    """Load previously geocoded addresses from disk, skipping expired entries."""
+    try:
+        with open(cache_file, "r", encoding="utf-8") as file:
+            geocode_cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(geocode_cache, dict):
+        return {}
+    now = time.time()
+    return {key: entry for key, entry in geocode_cache.items() if _is_fresh_geocode(entry, now)}
+
+
+def save_geocode_cache(geocode_cache, cache_file=GEOCODE_CACHE_FILE):
+    """Save geocoded addresses to disk for the next run, dropping expired entries."""
+    now = time.time()
+    fresh = {key: entry for key, entry in geocode_cache.items() if _is_fresh_geocode(entry, now)}
+    with open(cache_file, "w", encoding="utf-8") as file:
+        json.dump(fresh, file, indent=2, sort_keys=True)
+
+
+def create_map_with_meeting_types(address_dict, api_key, geocode_cache=None):
     """Creates a map with markers for each address."""
-    m = folium.Map(location=[39.7684, -86.1581], zoom_start=10)
-    for address, videos in address_dict.items():
-        lat, lng = geocode_address(address, api_key)
+    import folium
+    from folium.plugins import FastMarkerCluster
+    from googlemaps import Client as GoogleMaps
+
+    if geocode_cache is None:
+        geocode_cache = {}
+
+    # address_dict is keyed by normalized address, which is also the cache key.
+    # Expired entries count as misses and are geocoded again.
+    now = time.time()
+    missing = [
+        key for key in address_dict
+        if not _is_fresh_geocode(geocode_cache.get(key), now)
+    ]
+    missing_addresses = [address_dict[key]["address"] for key in missing]
+
+    # Geocode uncached addresses concurrently; the lookups are network-bound. The
+    # client is built before the pool so every worker shares its session and
+    # queries_per_second limiter.
+    gmaps = GoogleMaps(
+        api_key,
+        queries_per_second=GEOCODE_QUERIES_PER_SECOND,
+        timeout=GEOCODE_TIMEOUT,
+    )
+    with ThreadPoolExecutor(max_workers=GEOCODE_WORKERS) as executor:
+        results = executor.map(geocode_address, missing_addresses, repeat(gmaps))
+        for key, (lat, lng) in zip(missing, results):
+            if lat and lng:
+                geocode_cache[key] = {"lat": lat, "lng": lng, "cached_at": time.time()}
+            else:
+                # Never fall back to an expired entry when geocoding it again fails
+                geocode_cache.pop(key, None)
+
+    markers = []
+    for key, group in address_dict.items():
+        address = group["address"]
+        entry = geocode_cache.get(key)
+        if _is_fresh_geocode(entry, now):
+            lat, lng = entry["lat"], entry["lng"]
+        else:
+            lat, lng = None, None
         if lat and lng:
-            content = "".join(
-                f'<li>'
-                f'<b>{video["date"]} - {video["meeting_type"]}</b><br>'
-                f'Recording: <a href="{video["video_url"]}" target="_blank">Watch Video</a><br>'
-                f'Description: <a href="{video["description_file_url"]}" target="_blank">View Details</a>'
-                f'</li>'
-                for video in videos
-            )
             popup_content = (
                 f'<b>Address:</b> {address}<br>'
-                f'<b>Details:</b><ul>{content}</ul>'
+                f'<b>Details:</b><ul>{"".join(group["videos"])}</ul>'
             )
-            folium.Marker([lat, lng], popup=popup_content).add_to(m)
+            markers.append([lat, lng, popup_content])
         else:
             print(f"Skipping address {address} - Geocoding failed.")
+
+    # Emit all markers as one data array built client-side by a single callback,
+    # instead of rendering a separate Marker and Popup template per address
+    m = folium.Map(location=[39.7684, -86.1581], zoom_start=10)
+    FastMarkerCluster(markers, callback=_MARKER_CALLBACK, name="meetings").add_to(m)
     return m
 
 
+def save_map(meeting_map, output_file="index.html"):
+    """Renders the map, strips template indentation and writes it in a single call."""
+    html = _INDENTATION_RE.sub("\n", meeting_map.get_root().render())
+    with open(output_file, "wb") as file:
+        file.write(html.encode("utf-8"))
+
+
+def _list_channel_video_ids(ydl, url):
+    """Lists the video IDs on a channel and its tabs without resolving each video."""
+    result = ydl.extract_info(url, download=False)
+    video_ids = []
+    for entry in result.get('entries') or []:
+        if entry.get('ie_key') == 'YoutubeTab':
+            video_ids.extend(_list_channel_video_ids(ydl, entry['url']))
+        elif entry.get('id'):
+            video_ids.append(entry['id'])
+    # A video can be listed under more than one tab (e.g. Videos and Live)
+    return list(dict.fromkeys(video_ids))
+
+
+def _fetch_video_details(video_id, ydl_opts):
+    """Fetches the title and description of a single video."""
+    import yt_dlp
+
+    # YoutubeDL instances are not thread-safe, so each call gets its own
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        try:
+            video = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
+        except Exception as e:
+            print(f"Error fetching video details for {video_id}: {e}")
+            return None
+
+    if 'description' not in video:
+        return None
+    return {
+        "video_id": video['id'],
+        "title": video['title'],
+        "description": video.get('description') or ''
+    }
+
+
 def fetch_real_video_details(channel_url):
     """
     Fetches video details from a YouTube channel using yt-dlp and authentication via username and password.
     """
+    import yt_dlp
+
     # Fetch YouTube credentials from environment variables (set in GitHub Secrets)
     yt_username = os.getenv('YT_USERNAME')
     yt_password = os.getenv('YT_PASSWORD')
@@ -103,33 +261,24 @@ def fetch_real_video_details(channel_url):
     # yt-dlp options with username and password
     ydl_opts = {
         'quiet': True,
-        'extract_flat': False,  # We want the actual video details
-        'force_generic_extractor': True,
         'no_warnings': True,
+        'skip_download': True,
         'username': yt_username,
         'password': yt_password,
     }
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+    # List the channel in one flat pass; only IDs are needed at this point
+    with yt_dlp.YoutubeDL({**ydl_opts, 'extract_flat': 'in_playlist'}) as ydl:
         try:
-            result = ydl.extract_info(channel_url, download=False)
-            if 'entries' in result:
-                videos = result['entries']
-            else:
-                videos = []
+            video_ids = _list_channel_video_ids(ydl, channel_url)
         except Exception as e:
             print(f"Error fetching video details: {e}")
             return []
 
-    video_details = []
-
-    for video in videos:
-        if 'description' in video:
-            video_details.append({
-                "video_id": video['id'],
-                "title": video['title'],
-                "description": video.get('description', '')
-            })
+    # Fetch each video's description concurrently; the requests are network-bound
+    with ThreadPoolExecutor(max_workers=YOUTUBE_WORKERS) as executor:
+        results = executor.map(_fetch_video_details, video_ids, repeat(ydl_opts))
+        video_details = [video for video in results if video]
 
     return video_details
 
@@ -145,17 +294,16 @@ def main():
     # Fetch video details with the provided channel URL
     video_details = fetch_real_video_details(channel_url)
 
-    # Save video descriptions to files
-    save_descriptions_to_files(video_details)
-
-    # Group videos by address
-    address_dict = group_videos_with_short_addresses(video_details, base_file_url)
+    # Save video descriptions to files and group videos by address
+    address_dict = process_videos(video_details, base_file_url)
 
-    # Create map with video meeting details
-    meeting_map = create_map_with_meeting_types(address_dict, api_key)
+    # Create map with video meeting details, reusing coordinates from earlier runs
+    geocode_cache = load_geocode_cache()
+    meeting_map = create_map_with_meeting_types(address_dict, api_key, geocode_cache)
+    save_geocode_cache(geocode_cache)
 
     # Save the map to an HTML file
-    meeting_map.save("index.html")
+    save_map(meeting_map, "index.html")
     print("Map created and saved as index.html")
 
 